@@ -85,5 +85,11 @@ class ConfigWrapper(object):
         )
         bucket_factory = BucketCollection(**buckets)
         self.rate_limiter = pyrate_limiter.Limiter(bucket_factory, max_delay=math.inf)
+        # llm_tokens waits are polled (see APIWrapper._acquire_llm_tokens) instead of
+        # sleeping inside a limiter, which holds the limiter's lock while it sleeps
+        # and would stall every other rate limit in the meantime
+        self.token_rate_limiter = pyrate_limiter.Limiter(
+            bucket_factory, raise_when_fail=False
+        )
 
         self.api = APIWrapper(self)
@@ -2,18 +2,41 @@
 The `MapOperation` and `ParallelMapOperation` classes are subclasses of `BaseOperation` that perform mapping operations on input data. They use LLM-based processing to transform input items into output items based on specified prompts and schemas, and can also perform key dropping operations.
 """
 
-from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Dict, List, Optional, Tuple
+import functools
+import hashlib
+import itertools
+import json
+import threading
+import weakref
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from jinja2 import Environment, Template
 from tqdm import tqdm
 
 from docetl.operations.base import BaseOperation
-from docetl.operations.utils import RichLoopBar
+from docetl.operations.utils import LLMResult, RichLoopBar
 from docetl.base_schemas import Tool, ToolFunction
 from docetl.utils import completion_cost
 from pydantic import Field, field_validator
 
+# Prompts are only ever compiled from strings, so there is nothing on disk to
+# reload; compiled templates are memoized by _compile_jinja_template instead.
+_JINJA_ENV = Environment(autoescape=True, auto_reload=False)
+_PLAIN_JINJA_ENV = Environment(auto_reload=False)
+
+
+@functools.lru_cache(maxsize=1000)
+def _compile_jinja_template(template_string: str, autoescape: bool = True) -> Template:
+    """
+    Compile a Jinja2 template string once and reuse it for subsequent renders.
+    Environment.from_string bypasses the environment's own template cache, so
+    the memoization has to happen here. With autoescape=False the template
+    behaves like a plain jinja2.Template.
+    """
+    env = _JINJA_ENV if autoescape else _PLAIN_JINJA_ENV
+    return env.from_string(template_string)
+
 
 def render_jinja_template(template_string: str, data: Dict[str, Any]) -> str:
     """
@@ -23,9 +46,270 @@ def render_jinja_template(template_string: str, data: Dict[str, Any]) -> str:
     if not data:
         return ""
 
-    env = Environment(autoescape=True)
-    template = env.from_string(template_string)
-    return template.render(input=data)
+    return _compile_jinja_template(template_string).render(input=data)
+
+
+def _coalesce_prompts(rendered_prompts: List[str], output_keys: List[List[str]]) -> str:
+    """
+    Combine several rendered prompts into a single request, with one section
+    per task naming the output keys that task is responsible for.
+    """
+    sections = [
+        f"### Task {i}\n{prompt}\n\nPut the result of this task in: {', '.join(keys)}"
+        for i, (prompt, keys) in enumerate(zip(rendered_prompts, output_keys), start=1)
+    ]
+    return "Complete each of the following independent tasks.\n\n" + "\n\n".join(
+        sections
+    )
+
+
+def _operation_executor(operation: Any, max_workers: int) -> ThreadPoolExecutor:
+    """
+    Create a thread pool that lives as long as the operation, so repeated
+    execute() calls reuse worker threads instead of spinning up new ones. The
+    pool is shut down when the operation is garbage collected.
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    weakref.finalize(operation, executor.shutdown, wait=False)
+    return executor
+
+
+def _drop_key_set(config: Dict[str, Any]) -> frozenset:
+    """
+    The keys to drop from each output document. Keys are popped from the
+    outputs rather than rebuilding every dict without them, since only a few
+    keys are usually dropped.
+    """
+    return frozenset(config.get("drop_keys") or [])
+
+
+def _drop_keys_only(
+    input_data: List[Dict], drop_set: frozenset, in_place: bool = False
+) -> List[Dict]:
+    """
+    Drop keys from every document, for operations that do nothing else. With
+    in_place, the caller's documents are modified instead of copied.
+    """
+    dropped_results = []
+    for item in input_data:
+        new_item = item if in_place else dict(item)
+        for key in drop_set:
+            new_item.pop(key, None)
+        dropped_results.append(new_item)
+    return dropped_results
+
+
+def _run_windowed(
+    executor: ThreadPoolExecutor,
+    tasks: Iterable[Tuple[Any, ...]],
+    max_in_flight: int,
+) -> Iterator[Tuple[Any, Any]]:
+    """
+    Submit (key, fn, *args) tasks to the executor and yield (key, result) as each
+    one completes. Only max_in_flight tasks are submitted at a time, so there is
+    never a future (and closure) queued up for every input document at once, and
+    tasks are only pulled from the iterable as room frees up.
+    """
+    tasks = iter(tasks)
+    futures = {}
+    while True:
+        for key, fn, *args in itertools.islice(tasks, max_in_flight - len(futures)):
+            futures[executor.submit(fn, *args)] = key
+        if not futures:
+            return
+
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            # Release the future (and whatever it closes over) right away
+            yield futures.pop(future), future.result()
+
+
+def _progress_bar_options(total: int) -> Dict[str, Any]:
+    """
+    Progress bar options that redraw the bar at most ~200 times, so redraws
+    don't slow down draining results.
+    """
+    return {"total": total, "miniters": max(1, total // 200), "mininterval": 0.2}
+
+
+# Configuration checks that have already passed, keyed by the check and the
+# configuration serialized as sorted JSON (oldest entries are evicted first)
+_passed_config_checks: Dict[Tuple[Any, ...], None] = {}
+_passed_config_checks_lock = threading.Lock()
+_MAX_PASSED_CONFIG_CHECKS = 1024
+
+
+def _memoized_config_check(
+    check: Callable[..., None], *args: Any, config: Dict[str, Any]
+) -> None:
+    """
+    Run check(*args, config) unless it already passed for an equal configuration.
+    Optimizers re-check identical configurations many times, so each distinct
+    one is only validated (by pydantic, for map) once. The check always sees the
+    real configuration; configurations that aren't plain JSON, such as ones
+    holding arbitrary objects or mixing key types, are checked every time.
+    """
+    try:
+        key = (check, *args, json.dumps(config, sort_keys=True))
+    except (TypeError, ValueError):
+        check(*args, config)
+        return
+    if key in _passed_config_checks:
+        return
+
+    check(*args, config)
+    with _passed_config_checks_lock:
+        _passed_config_checks[key] = None
+        if len(_passed_config_checks) > _MAX_PASSED_CONFIG_CHECKS:
+            del _passed_config_checks[next(iter(_passed_config_checks))]
+
+
+def _check_map_config(schema: type, config: Dict[str, Any]) -> None:
+    """
+    Validate a map operation configuration.
+    """
+    config = schema(**config)
+
+    if config.drop_keys:
+        if any(not isinstance(key, str) for key in config.drop_keys):
+            raise TypeError("All items in 'drop_keys' must be strings")
+    elif not (config.prompt and config.output):
+        raise ValueError(
+            "If 'drop_keys' is not specified, both 'prompt' and 'output' must be present in the configuration"
+        )
+
+    if config.prompt or config.output:
+        for key in ["prompt", "output"]:
+            if not getattr(config, key):
+                raise ValueError(
+                    f"Missing required key '{key}' in MapOperation configuration"
+                )
+
+        if config.output and not config.output["schema"]:
+            raise ValueError("Missing 'schema' in 'output' configuration")
+
+        if config.prompt:
+            try:
+                _compile_jinja_template(config.prompt, autoescape=False)
+            except Exception as e:
+                raise ValueError(
+                    f"Invalid Jinja2 template in 'prompt': {str(e)}"
+                ) from e
+
+        if config.model and not isinstance(config.model, str):
+            raise TypeError("'model' in configuration must be a string")
+
+        if config.tools:
+            for tool in config.tools:
+                try:
+                    tool_obj = Tool(**tool)
+                except Exception as e:
+                    raise TypeError("Tool must be a dictionary")
+
+                if not (tool_obj.code and tool_obj.function):
+                    raise ValueError(
+                        "Tool is missing required 'code' or 'function' key"
+                    )
+
+                if not isinstance(tool_obj.function, ToolFunction):
+                    raise TypeError("'function' in tool must be a dictionary")
+
+                for key in ["name", "description", "parameters"]:
+                    if not getattr(tool_obj.function, key):
+                        raise ValueError(
+                            f"Tool is missing required '{key}' in 'function'"
+                        )
+
+        if config.row_marshal_size is not None:
+            if config.row_marshal_size < 1:
+                raise ValueError("'row_marshal_size' must be a positive integer")
+            if config.row_marshal_size > 1 and (config.tools or config.gleaning):
+                raise ValueError(
+                    "'row_marshal_size' greater than 1 cannot be combined with 'tools' or 'gleaning'"
+                )
+
+
+def _check_parallel_map_config(config: Dict[str, Any]) -> None:
+    """
+    Validate a parallel map operation configuration.
+    """
+
+    if "drop_keys" in config:
+        if not isinstance(config["drop_keys"], list):
+            raise TypeError("'drop_keys' in configuration must be a list of strings")
+        for key in config["drop_keys"]:
+            if not isinstance(key, str):
+                raise TypeError("All items in 'drop_keys' must be strings")
+    elif "prompts" not in config:
+        raise ValueError(
+            "If 'drop_keys' is not specified, 'prompts' must be present in the configuration"
+        )
+
+    if "in_place" in config and not isinstance(config["in_place"], bool):
+        raise TypeError("'in_place' in configuration must be a boolean")
+
+    if "coalesce_prompts" in config and not isinstance(
+        config["coalesce_prompts"], bool
+    ):
+        raise TypeError("'coalesce_prompts' in configuration must be a boolean")
+
+    if "prompts" in config:
+        if not isinstance(config["prompts"], list):
+            raise ValueError(
+                "ParallelMapOperation requires a 'prompts' list in the configuration"
+            )
+
+        if not config["prompts"]:
+            raise ValueError("The 'prompts' list cannot be empty")
+
+        for i, prompt_config in enumerate(config["prompts"]):
+            if not isinstance(prompt_config, dict):
+                raise TypeError(f"Prompt configuration {i} must be a dictionary")
+
+            required_keys = ["prompt", "output_keys"]
+            for key in required_keys:
+                if key not in prompt_config:
+                    raise ValueError(
+                        f"Missing required key '{key}' in prompt configuration {i}"
+                    )
+            if not isinstance(prompt_config["prompt"], str):
+                raise TypeError(
+                    f"'prompt' in prompt configuration {i} must be a string"
+                )
+
+            if not isinstance(prompt_config["output_keys"], list):
+                raise TypeError(
+                    f"'output_keys' in prompt configuration {i} must be a list"
+                )
+
+            if not prompt_config["output_keys"]:
+                raise ValueError(
+                    f"'output_keys' list in prompt configuration {i} cannot be empty"
+                )
+
+            # Check if the prompt is a valid Jinja2 template
+            try:
+                _compile_jinja_template(prompt_config["prompt"])
+            except Exception as e:
+                raise ValueError(
+                    f"Invalid Jinja2 template in prompt configuration {i}: {str(e)}"
+                ) from e
+
+            # Check if the model is specified (optional)
+            if "model" in prompt_config and not isinstance(prompt_config["model"], str):
+                raise TypeError(f"'model' in prompt configuration {i} must be a string")
+
+        # Check if all output schema keys are covered by the prompts
+        output_schema = config["output"]["schema"]
+        output_keys_covered = set()
+        for prompt_config in config["prompts"]:
+            output_keys_covered.update(prompt_config["output_keys"])
+
+        missing_keys = set(output_schema.keys()) - output_keys_covered
+        if missing_keys:
+            raise ValueError(
+                f"The following output schema keys are not covered by any prompt: {missing_keys}"
+            )
 
 
 class MapOperation(BaseOperation):
@@ -47,6 +331,8 @@ class MapOperation(BaseOperation):
         timeout: Optional[int] = None
         batch_size: Optional[int] = None
         clustering_method: Optional[str] = None
+        row_marshal_size: Optional[int] = None
+        in_place: Optional[bool] = None
 
         @field_validator("drop_keys")
         def validate_drop_keys(cls, v):
@@ -64,6 +350,7 @@ class MapOperation(BaseOperation):
             "max_batch_size", kwargs.get("max_batch_size", float("inf"))
         )
         self.clustering_method = "random"
+        self._executor = _operation_executor(self, self.max_batch_size)
 
     def syntax_check(self) -> None:
         """
@@ -73,58 +360,8 @@ class MapOperation(BaseOperation):
             ValueError: If required keys are missing or invalid in the configuration.
             TypeError: If configuration values have incorrect types.
         """
-        config = self.schema(**self.config)
-
-        if config.drop_keys:
-            if any(not isinstance(key, str) for key in config.drop_keys):
-                raise TypeError("All items in 'drop_keys' must be strings")
-        elif not (config.prompt and config.output):
-            raise ValueError(
-                "If 'drop_keys' is not specified, both 'prompt' and 'output' must be present in the configuration"
-            )
-
-        if config.prompt or config.output:
-            for key in ["prompt", "output"]:
-                if not getattr(config, key):
-                    raise ValueError(
-                        f"Missing required key '{key}' in MapOperation configuration"
-                    )
-
-            if config.output and not config.output["schema"]:
-                raise ValueError("Missing 'schema' in 'output' configuration")
-
-            if config.prompt:
-                try:
-                    Template(config.prompt)
-                except Exception as e:
-                    raise ValueError(
-                        f"Invalid Jinja2 template in 'prompt': {str(e)}"
-                    ) from e
-
-            if config.model and not isinstance(config.model, str):
-                raise TypeError("'model' in configuration must be a string")
-
-            if config.tools:
-                for tool in config.tools:
-                    try:
-                        tool_obj = Tool(**tool)
-                    except Exception as e:
-                        raise TypeError("Tool must be a dictionary")
-
-                    if not (tool_obj.code and tool_obj.function):
-                        raise ValueError(
-                            "Tool is missing required 'code' or 'function' key"
-                        )
-
-                    if not isinstance(tool_obj.function, ToolFunction):
-                        raise TypeError("'function' in tool must be a dictionary")
-
-                    for key in ["name", "description", "parameters"]:
-                        if not getattr(tool_obj.function, key):
-                            raise ValueError(
-                                f"Tool is missing required '{key}' in 'function'"
-                            )
-
+        _memoized_config_check(_check_map_config, self.schema, config=self.config)
+        if self.config.get("prompt") or self.config.get("output"):
             self.gleaning_check()
 
     def execute(self, input_data: List[Dict]) -> Tuple[List[Dict], float]:
@@ -146,97 +383,264 @@ class MapOperation(BaseOperation):
 
         The method uses parallel processing to improve performance.
         """
+        drop_set = _drop_key_set(self.config)
+
         # Check if there's no prompt and only drop_keys
         if "prompt" not in self.config and "drop_keys" in self.config:
             # If only drop_keys is specified, simply drop the keys and return
-            dropped_results = []
-            for item in input_data:
-                new_item = {
-                    k: v for k, v in item.items() if k not in self.config["drop_keys"]
-                }
-                dropped_results.append(new_item)
+            dropped_results = _drop_keys_only(
+                input_data, drop_set, self.config.get("in_place", False)
+            )
             return dropped_results, 0.0  # Return the modified data with no cost
 
         if self.status:
             self.status.stop()
 
-        def _process_map_item(item: Dict) -> Tuple[Optional[Dict], float]:
-            prompt_template = Template(self.config["prompt"])
-            prompt = prompt_template.render(input=item)
+        # Look these up once rather than once per item
+        model = self.config.get("model", self.default_model)
+        output_schema = self.config["output"]["schema"]
+        tools = self.config.get("tools", None)
+        timeout_seconds = self.config.get("timeout", 120)
+        max_retries_per_timeout = self.config.get("max_retries_per_timeout", 2)
+        validation_rules = self.config.get("validate", None)
+        gleaning_config = self.config.get("gleaning", None)
+        verbose = self.config.get("verbose", False)
+        bypass_cache = self.config.get("bypass_cache", False)
+
+        # Compile the prompt once; the same template is rendered for every item
+        prompt_template = _compile_jinja_template(
+            self.config["prompt"], autoescape=False
+        )
+
+        # Items that render to the same prompt share a single in-flight LLM call.
+        # Validation rules can look at input keys the prompt doesn't use, and
+        # bypass_cache asks for fresh calls, so neither is deduplicated.
+        dedupe_calls = not validation_rules and not bypass_cache
+        call_key_prefix = json.dumps([model, output_schema, tools], sort_keys=True)
+        in_flight_calls: Dict[bytes, Future] = {}
+        in_flight_lock = threading.Lock()
+
+        def _call_llm_once(
+            prompt: str, call_llm: Callable[[], LLMResult]
+        ) -> Tuple[LLMResult, bool]:
+            key = hashlib.blake2b(
+                (call_key_prefix + prompt).encode(), digest_size=16
+            ).digest()
+            with in_flight_lock:
+                future = in_flight_calls.get(key)
+                is_duplicate = future is not None
+                if not is_duplicate:
+                    future = in_flight_calls[key] = Future()
+            if is_duplicate:
+                return future.result(), True
+
+            try:
+                future.set_result(call_llm())
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            finally:
+                # Later repeats of this prompt are served by the LLM cache
+                with in_flight_lock:
+                    del in_flight_calls[key]
+            return future.result(), False
+
+        def _process_map_item(item: Dict, prompt: str) -> Tuple[Optional[Dict], float]:
+            # The last response parsed during validation, so a validated response
+            # doesn't have to be parsed (and its tools run) a second time
+            last_parsed: Dict[str, Any] = {}
 
             def validation_fn(response: Dict[str, Any]):
                 output = self.runner.api.parse_llm_response(
                     response,
-                    schema=self.config["output"]["schema"],
-                    tools=self.config.get("tools", None),
+                    schema=output_schema,
+                    tools=tools,
                     manually_fix_errors=self.manually_fix_errors,
                 )[0]
+                last_parsed.update(response=response, output=output)
+                output = dict(output)
                 for key, value in item.items():
-                    if key not in self.config["output"]["schema"]:
+                    if key not in output_schema:
                         output[key] = value
                 if self.runner.api.validate_output(self.config, output, self.console):
                     return output, True
                 return output, False
 
+            def call_llm() -> LLMResult:
+                self.runner.rate_limiter.try_acquire("call", weight=1)
+                return self.runner.api.call_llm(
+                    model,
+                    "map",
+                    [{"role": "user", "content": prompt}],
+                    output_schema,
+                    tools=tools,
+                    scratchpad=None,
+                    timeout_seconds=timeout_seconds,
+                    max_retries_per_timeout=max_retries_per_timeout,
+                    validation_config=(
+                        {
+                            "num_retries": self.num_retries_on_validate_failure,
+                            "val_rule": validation_rules,
+                            "validation_fn": validation_fn,
+                        }
+                        if validation_rules
+                        else None
+                    ),
+                    gleaning_config=gleaning_config,
+                    verbose=verbose,
+                    bypass_cache=bypass_cache,
+                )
+
+            if dedupe_calls:
+                llm_result, is_duplicate = _call_llm_once(prompt, call_llm)
+            else:
+                llm_result, is_duplicate = call_llm(), False
+            # The cost of a shared call is only counted for the item that made it
+            cost = 0.0 if is_duplicate else llm_result.total_cost
+
+            if llm_result.validated:
+                if last_parsed.get("response") is llm_result.response:
+                    output = last_parsed["output"]
+                else:
+                    # Parse the response
+                    output = self.runner.api.parse_llm_response(
+                        llm_result.response,
+                        schema=output_schema,
+                        tools=tools,
+                        manually_fix_errors=self.manually_fix_errors,
+                    )[0]
+                # Augment the output with the original item
+                output = {**item, **output}
+                return output, cost
+
+            return None, cost
+
+        def _process_map_batch(
+            batch: List[Dict], rendered_prompts: List[str]
+        ) -> Tuple[List[Optional[Dict]], float]:
+            # Several rows share one LLM call; each row gets its own copy of the
+            # output schema keys, prefixed with its position in the batch
+            batch_schema = {
+                f"row_{j}_{key}": value
+                for j in range(len(batch))
+                for key, value in output_schema.items()
+            }
+            prompt = (
+                f"You are given {len(batch)} rows to process. Apply each row's instructions to that row independently. "
+                f"Put the answers for row j in the output keys prefixed with `row_j_`.\n\n"
+                + "\n\n".join(
+                    f"Row {j}:\n{rendered_prompt}"
+                    for j, rendered_prompt in enumerate(rendered_prompts)
+                )
+            )
+
+            def split_output(output: Dict[str, Any]) -> List[Dict[str, Any]]:
+                return [
+                    {
+                        **item,
+                        **{key: output.get(f"row_{j}_{key}") for key in output_schema},
+                    }
+                    for j, item in enumerate(batch)
+                ]
+
+            last_parsed: Dict[str, Any] = {}
+
+            def validation_fn(response: Dict[str, Any]):
+                output = self.runner.api.parse_llm_response(
+                    response,
+                    schema=batch_schema,
+                    manually_fix_errors=self.manually_fix_errors,
+                )[0]
+                last_parsed.update(response=response, output=output)
+                valid = all(
+                    self.runner.api.validate_output(self.config, row, self.console)
+                    for row in split_output(output)
+                )
+                return output, valid
+
             self.runner.rate_limiter.try_acquire("call", weight=1)
             llm_result = self.runner.api.call_llm(
-                self.config.get("model", self.default_model),
+                model,
                 "map",
                 [{"role": "user", "content": prompt}],
-                self.config["output"]["schema"],
-                tools=self.config.get("tools", None),
+                batch_schema,
                 scratchpad=None,
-                timeout_seconds=self.config.get("timeout", 120),
-                max_retries_per_timeout=self.config.get("max_retries_per_timeout", 2),
+                timeout_seconds=timeout_seconds,
+                max_retries_per_timeout=max_retries_per_timeout,
                 validation_config=(
                     {
                         "num_retries": self.num_retries_on_validate_failure,
-                        "val_rule": self.config.get("validate", []),
+                        "val_rule": validation_rules,
                         "validation_fn": validation_fn,
                     }
-                    if self.config.get("validate", None)
+                    if validation_rules
                     else None
                 ),
-                gleaning_config=self.config.get("gleaning", None),
-                verbose=self.config.get("verbose", False),
-                bypass_cache=self.config.get("bypass_cache", False),
+                verbose=verbose,
+                bypass_cache=bypass_cache,
             )
 
             if llm_result.validated:
-                # Parse the response
-                output = self.runner.api.parse_llm_response(
-                    llm_result.response,
-                    schema=self.config["output"]["schema"],
-                    tools=self.config.get("tools", None),
-                    manually_fix_errors=self.manually_fix_errors,
-                )[0]
-                # Augment the output with the original item
-                output = {**item, **output}
-                return output, llm_result.total_cost
-
-            return None, llm_result.total_cost
-
-        with ThreadPoolExecutor(max_workers=self.max_batch_size) as executor:
-            futures = [executor.submit(_process_map_item, item) for item in input_data]
-            results = []
-            total_cost = 0
-            pbar = RichLoopBar(
-                range(len(futures)),
-                desc=f"Processing {self.config['name']} (map) on all documents",
-                console=self.console,
-            )
-            for i in pbar:
-                result, item_cost = futures[i].result()
-                if result is not None:
-                    if "drop_keys" in self.config:
-                        result = {
-                            k: v
-                            for k, v in result.items()
-                            if k not in self.config["drop_keys"]
-                        }
-                    results.append(result)
-                total_cost += item_cost
-                pbar.update(i)
+                if last_parsed.get("response") is llm_result.response:
+                    output = last_parsed["output"]
+                else:
+                    output = self.runner.api.parse_llm_response(
+                        llm_result.response,
+                        schema=batch_schema,
+                        manually_fix_errors=self.manually_fix_errors,
+                    )[0]
+                return split_output(output), llm_result.total_cost
+
+            return [None] * len(batch), llm_result.total_cost
+
+        def _process_map_unit(
+            batch: List[Dict], rendered_prompts: List[str]
+        ) -> Tuple[List[Optional[Dict]], float]:
+            if row_marshal_size == 1:
+                result, cost = _process_map_item(batch[0], rendered_prompts[0])
+                return [result], cost
+            return _process_map_batch(batch, rendered_prompts)
+
+        # Group rows into units of work that each take one LLM call. Prompts are
+        # rendered here, as units are submitted, rather than on the workers:
+        # rendering is CPU-bound and holds the GIL, while the workers mostly wait
+        # on the network
+        row_marshal_size = self.config.get("row_marshal_size") or 1
+
+        def units_to_submit():
+            for start in range(0, len(input_data), row_marshal_size):
+                batch = input_data[start : start + row_marshal_size]
+                rendered_prompts = [
+                    prompt_template.render(input=item) for item in batch
+                ]
+                yield start, _process_map_unit, batch, rendered_prompts
+
+        max_in_flight = 2 * (
+            self.max_threads
+            if self.max_batch_size == float("inf")
+            else self.max_batch_size
+        )
+
+        # Results are collected as they complete, but kept in input order
+        results = [None] * len(input_data)
+        total_cost = 0
+        with RichLoopBar(
+            desc=f"Processing {self.config['name']} (map) on all documents",
+            console=self.console,
+            **_progress_bar_options(len(input_data)),
+        ) as pbar:
+            for start, (unit_results, unit_cost) in _run_windowed(
+                self._executor, units_to_submit(), max_in_flight
+            ):
+                for offset, result in enumerate(unit_results):
+                    if result is not None:
+                        # Results are fresh dicts, so it's safe to drop in place
+                        for key in drop_set:
+                            result.pop(key, None)
+                        results[start + offset] = result
+                total_cost += unit_cost
+                pbar.update(len(unit_results))
+        results = [result for result in results if result is not None]
 
         if self.status:
             self.status.start()
@@ -249,6 +653,8 @@ class ParallelMapOperation(BaseOperation):
         type: str = "parallel_map"
         prompts: List[Dict[str, Any]]
         output: Dict[str, Any]
+        in_place: Optional[bool] = None
+        coalesce_prompts: Optional[bool] = None
 
     def __init__(
         self,
@@ -256,6 +662,7 @@ class ParallelMapOperation(BaseOperation):
         **kwargs,
     ):
         super().__init__(*args, **kwargs)
+        self._executor = _operation_executor(self, self.max_threads)
 
     def syntax_check(self) -> None:
         """
@@ -265,80 +672,7 @@ class ParallelMapOperation(BaseOperation):
             ValueError: If required keys are missing or if the configuration structure is invalid.
             TypeError: If the configuration values have incorrect types.
         """
-        if "drop_keys" in self.config:
-            if not isinstance(self.config["drop_keys"], list):
-                raise TypeError(
-                    "'drop_keys' in configuration must be a list of strings"
-                )
-            for key in self.config["drop_keys"]:
-                if not isinstance(key, str):
-                    raise TypeError("All items in 'drop_keys' must be strings")
-        elif "prompts" not in self.config:
-            raise ValueError(
-                "If 'drop_keys' is not specified, 'prompts' must be present in the configuration"
-            )
-
-        if "prompts" in self.config:
-            if not isinstance(self.config["prompts"], list):
-                raise ValueError(
-                    "ParallelMapOperation requires a 'prompts' list in the configuration"
-                )
-
-            if not self.config["prompts"]:
-                raise ValueError("The 'prompts' list cannot be empty")
-
-            for i, prompt_config in enumerate(self.config["prompts"]):
-                if not isinstance(prompt_config, dict):
-                    raise TypeError(f"Prompt configuration {i} must be a dictionary")
-
-                required_keys = ["prompt", "output_keys"]
-                for key in required_keys:
-                    if key not in prompt_config:
-                        raise ValueError(
-                            f"Missing required key '{key}' in prompt configuration {i}"
-                        )
-                if not isinstance(prompt_config["prompt"], str):
-                    raise TypeError(
-                        f"'prompt' in prompt configuration {i} must be a string"
-                    )
-
-                if not isinstance(prompt_config["output_keys"], list):
-                    raise TypeError(
-                        f"'output_keys' in prompt configuration {i} must be a list"
-                    )
-
-                if not prompt_config["output_keys"]:
-                    raise ValueError(
-                        f"'output_keys' list in prompt configuration {i} cannot be empty"
-                    )
-
-                # Check if the prompt is a valid Jinja2 template
-                try:
-                    Template(prompt_config["prompt"])
-                except Exception as e:
-                    raise ValueError(
-                        f"Invalid Jinja2 template in prompt configuration {i}: {str(e)}"
-                    ) from e
-
-                # Check if the model is specified (optional)
-                if "model" in prompt_config and not isinstance(
-                    prompt_config["model"], str
-                ):
-                    raise TypeError(
-                        f"'model' in prompt configuration {i} must be a string"
-                    )
-
-            # Check if all output schema keys are covered by the prompts
-            output_schema = self.config["output"]["schema"]
-            output_keys_covered = set()
-            for prompt_config in self.config["prompts"]:
-                output_keys_covered.update(prompt_config["output_keys"])
-
-            missing_keys = set(output_schema.keys()) - output_keys_covered
-            if missing_keys:
-                raise ValueError(
-                    f"The following output schema keys are not covered by any prompt: {missing_keys}"
-                )
+        _memoized_config_check(_check_parallel_map_config, config=self.config)
 
     def execute(self, input_data: List[Dict]) -> Tuple[List[Dict], float]:
         """
@@ -357,29 +691,67 @@ class ParallelMapOperation(BaseOperation):
         4. If drop_keys is specified, it drops the specified keys from each document
         5. Calculates total cost of the operation
         """
-        results = {}
         total_cost = 0
         output_schema = self.config.get("output", {}).get("schema", {})
 
+        drop_set = _drop_key_set(self.config)
+
         # Check if there's no prompt and only drop_keys
         if "prompts" not in self.config and "drop_keys" in self.config:
             # If only drop_keys is specified, simply drop the keys and return
-            dropped_results = []
-            for item in input_data:
-                new_item = {
-                    k: v for k, v in item.items() if k not in self.config["drop_keys"]
-                }
-                dropped_results.append(new_item)
+            dropped_results = _drop_keys_only(
+                input_data, drop_set, self.config.get("in_place", False)
+            )
             return dropped_results, 0.0  # Return the modified data with no cost
 
         if self.status:
             self.status.stop()
 
-        def process_prompt(item, prompt_config):
-            prompt = render_jinja_template(prompt_config["prompt"], item)
-            local_output_schema = {
-                key: output_schema[key] for key in prompt_config["output_keys"]
+        # Look these up once rather than once per (item, prompt) pair
+        prompts = self.config.get("prompts", [])
+
+        # Each group of prompts is sent to the LLM as a single call. With
+        # coalesce_prompts, prompts that share a model (and use no tools) are
+        # grouped together; otherwise every prompt is its own call.
+        if self.config.get("coalesce_prompts", False):
+            prompt_groups = []
+            groups_by_model = {}
+            for prompt_config in prompts:
+                if prompt_config.get("tools"):
+                    prompt_groups.append([prompt_config])
+                    continue
+                model = prompt_config.get("model", self.default_model)
+                if model not in groups_by_model:
+                    groups_by_model[model] = []
+                    prompt_groups.append(groups_by_model[model])
+                groups_by_model[model].append(prompt_config)
+        else:
+            prompt_groups = [[prompt_config] for prompt_config in prompts]
+
+        local_output_schemas = [
+            {
+                key: output_schema[key]
+                for prompt_config in group
+                for key in prompt_config["output_keys"]
             }
+            for group in prompt_groups
+        ]
+        timeout_seconds = self.config.get("timeout", 120)
+        max_retries_per_timeout = self.config.get("max_retries_per_timeout", 2)
+        bypass_cache = self.config.get("bypass_cache", False)
+
+        def process_prompt(item, group_index):
+            group = prompt_groups[group_index]
+            prompt_config = group[0]
+            local_output_schema = local_output_schemas[group_index]
+            tools = prompt_config.get("tools", None)
+            if len(group) == 1:
+                prompt = render_jinja_template(prompt_config["prompt"], item)
+            else:
+                prompt = _coalesce_prompts(
+                    [render_jinja_template(p["prompt"], item) for p in group],
+                    [p["output_keys"] for p in group],
+                )
 
             # Start of Selection
             # If there are tools, we need to pass in the tools
@@ -388,64 +760,57 @@ class ParallelMapOperation(BaseOperation):
                 "parallel_map",
                 [{"role": "user", "content": prompt}],
                 local_output_schema,
-                tools=prompt_config.get("tools", None),
-                timeout_seconds=self.config.get("timeout", 120),
-                max_retries_per_timeout=self.config.get("max_retries_per_timeout", 2),
-                bypass_cache=self.config.get("bypass_cache", False),
+                tools=tools,
+                timeout_seconds=timeout_seconds,
+                max_retries_per_timeout=max_retries_per_timeout,
+                bypass_cache=bypass_cache,
             )
             output = self.runner.api.parse_llm_response(
                 response.response,
                 schema=local_output_schema,
-                tools=prompt_config.get("tools", None),
+                tools=tools,
                 manually_fix_errors=self.manually_fix_errors,
             )[0]
             return output, response.total_cost
 
-        with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
-            if "prompts" in self.config:
-                # Create all futures at once
-                all_futures = [
-                    executor.submit(process_prompt, item, prompt_config)
-                    for item in input_data
-                    for prompt_config in self.config["prompts"]
-                ]
-
-                # Process results in order
-                for i in tqdm(
-                    range(len(all_futures)),
-                    desc="Processing parallel map items",
-                ):
-                    future = all_futures[i]
-                    output, cost = future.result()
-                    total_cost += cost
+        # Copy every item upfront; outputs are merged into these as they arrive
+        results = [item.copy() for item in input_data]
 
-                    # Determine which item this future corresponds to
-                    item_index = i // len(self.config["prompts"])
-                    prompt_index = i % len(self.config["prompts"])
+        if "prompts" in self.config:
+            # Number of prompt groups still outstanding for each item
+            pending = [len(prompt_groups)] * len(input_data)
 
-                    # Initialize or update the item_result
-                    if prompt_index == 0:
-                        item_result = input_data[item_index].copy()
-                        results[item_index] = item_result
+            prompts_to_submit = (
+                (item_index, process_prompt, item, group_index)
+                for item_index, item in enumerate(input_data)
+                for group_index in range(len(prompt_groups))
+            )
 
-                    # Fetch the item_result
-                    item_result = results[item_index]
+            with tqdm(
+                desc="Processing parallel map items",
+                **_progress_bar_options(len(input_data) * len(prompt_groups)),
+            ) as pbar:
+                for item_index, (output, cost) in _run_windowed(
+                    self._executor, prompts_to_submit, 2 * self.max_threads
+                ):
+                    total_cost += cost
 
                     # Update the item_result with the output
-                    item_result.update(output)
-
-            else:
-                results = {i: item.copy() for i, item in enumerate(input_data)}
-
-        # Apply drop_keys if specified
-        if "drop_keys" in self.config:
-            drop_keys = self.config["drop_keys"]
-            for item in results.values():
-                for key in drop_keys:
+                    results[item_index].update(output)
+
+                    # Once every prompt for this item is done, drop keys right away
+                    pending[item_index] -= 1
+                    if pending[item_index] == 0:
+                        for key in drop_set:
+                            results[item_index].pop(key, None)
+                    pbar.update()
+
+        else:
+            for item in results:
+                for key in drop_set:
                     item.pop(key, None)
 
         if self.status:
             self.status.start()
 
-        # Return the results in order
-        return [results[i] for i in range(len(input_data)) if i in results], total_cost
+        return results, total_cost
@@ -3,9 +3,11 @@ import functools
 import hashlib
 import json
 import os
+import re
 import shutil
 import threading
-from concurrent.futures import as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 import litellm
@@ -25,6 +27,11 @@ from pydantic import BaseModel
 from docetl.utils import completion_cost, count_tokens
 import time
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 aeval = Interpreter()
 
 load_dotenv()
@@ -284,24 +291,33 @@ class InvalidOutputError(Exception):
         )
 
 
+# Worker threads for timed calls are reused across calls instead of starting a
+# fresh thread per LLM request; the executor only spawns a new thread when none
+# are idle. Timed-out calls can't be cancelled and keep their worker until they
+# return, so up to 1024 calls can be running or abandoned at once. Further calls
+# queue for a worker for up to their timeout, and then for up to their timeout
+# again once they start running.
+_timeout_executor = ThreadPoolExecutor(max_workers=1024)
+
+
 def timeout(seconds):
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            result = [TimeoutError("Function call timed out")]
+            started = threading.Event()
 
-            def target():
-                try:
-                    result[0] = func(*args, **kwargs)
-                except Exception as e:
-                    result[0] = e
+            def run():
+                started.set()
+                return func(*args, **kwargs)
 
-            thread = threading.Thread(target=target)
-            thread.start()
-            thread.join(seconds)
-            if isinstance(result[0], Exception):
-                raise result[0]
-            return result[0]
+            future = _timeout_executor.submit(run)
+            # If no worker frees up in time, give up without ever running the call
+            if not started.wait(seconds) and future.cancel():
+                raise TimeoutError("Function call timed out waiting for a worker")
+            try:
+                return future.result(timeout=seconds)
+            except FuturesTimeoutError:
+                raise TimeoutError("Function call timed out")
 
         return wrapper
 
@@ -354,6 +370,67 @@ def truncate_messages(
     return truncated_messages
 
 
+# orjson turns integers beyond 64 bits into floats instead of rejecting them, so
+# anything with a run of 19+ digits is left to the standard library
+_LONG_DIGITS = re.compile(r"\d{19}")
+_LONG_DIGITS_BYTES = re.compile(rb"\d{19}")
+
+
+def loads_llm_json(s: Union[str, bytes]) -> Any:
+    """
+    Parse JSON produced by an LLM. Uses orjson when it is installed, since this
+    runs once per LLM call, and falls back to the standard library for inputs
+    orjson rejects (e.g. NaN literals) or would parse differently (integers
+    beyond 64 bits), or when orjson isn't available.
+    """
+    long_digits = _LONG_DIGITS_BYTES if isinstance(s, bytes) else _LONG_DIGITS
+    if orjson is not None and not long_digits.search(s):
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(s)
+
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """
+    Cheaply estimate the number of tokens in a list of messages, assuming
+    roughly four characters per token. Used for rate limiting, where running
+    the real tokenizer on every call would cost more than it saves.
+    """
+    return sum(len(str(msg.get("content", ""))) for msg in messages) // 4 + 1
+
+
+def _llm_system_prompt(
+    op_type: str, output_schema: Dict[str, str], scratchpad: Optional[str] = None
+) -> str:
+    """
+    Build the system prompt sent with every structured LLM call.
+    """
+    system_prompt = f"You are a helpful assistant, intelligently processing data. This is a {op_type} operation. You will perform the specified task on the provided data. The result should be a structured output that you will send back to the user."
+    if scratchpad:
+        system_prompt += f"""
+
+You are incrementally processing data across multiple batches. Maintain intermediate state between batches to accomplish this task effectively.
+
+Current scratchpad: {scratchpad}
+
+As you process each batch:
+1. Update the scratchpad with crucial information for subsequent batches.
+2. This may include partial results, counters, or data that doesn't fit into {list(output_schema.keys())}.
+3. Example: For counting elements that appear more than twice, track all occurrences in the scratchpad until an item exceeds the threshold.
+
+Keep the scratchpad concise (~500 chars) and easily parsable. Use clear structures like:
+- Bullet points
+- Key-value pairs
+- JSON-like format
+
+Update the 'updated_scratchpad' field in your output with the new scratchpad content.
+
+Remember: The scratchpad should contain information necessary for processing future batches, not the final result."""
+    return system_prompt
+
+
 def safe_eval(expression: str, output: Dict) -> bool:
     """
     Safely evaluate an expression with a given output dictionary.
@@ -377,6 +454,25 @@ class APIWrapper(object):
     def __init__(self, runner):
         self.runner = runner
 
+    def _acquire_llm_tokens(self, messages: List[Dict[str, str]]) -> None:
+        """
+        Wait until the `llm_tokens` rate limit, if configured, has room for the
+        estimated size of these messages. Waiting up front is cheaper than being
+        rejected by the provider and backing off.
+
+        A single call larger than the smallest configured window could never fit,
+        so its weight is capped at that window and it waits for a full one.
+        """
+        token_limits = self.runner.config.get("rate_limits", {}).get("llm_tokens")
+        if not token_limits:
+            return
+        max_weight = int(min(limit["count"] for limit in token_limits))
+        weight = min(estimate_tokens(messages), max_weight)
+        while not self.runner.token_rate_limiter.try_acquire(
+            "llm_tokens", weight=weight
+        ):
+            time.sleep(0.05)
+
     @freezeargs
     def gen_embedding(self, model: str, input: List[str]) -> List[float]:
         """
@@ -494,15 +590,17 @@ class APIWrapper(object):
                         validator_prompt = validator_prompt_template.render(
                             output=parsed_output
                         )
+                        validator_call_messages = truncate_messages(
+                            validator_messages
+                            + [{"role": "user", "content": validator_prompt}],
+                            model,
+                        )
                         self.runner.rate_limiter.try_acquire("llm_call", weight=1)
+                        self._acquire_llm_tokens(validator_call_messages)
 
                         validator_response = completion(
                             model=gleaning_config.get("model", model),
-                            messages=truncate_messages(
-                                validator_messages
-                                + [{"role": "user", "content": validator_prompt}],
-                                model,
-                            ),
+                            messages=validator_call_messages,
                             response_format={
                                 "type": "json_schema",
                                 "json_schema": {
@@ -653,10 +751,25 @@ class APIWrapper(object):
         """
         key = cache_key(model, op_type, messages, output_schema, scratchpad)
 
+        # Wait for the llm_tokens budget here, before the call is timed: the wait
+        # shouldn't count against the timeout, and a timed-out call's worker must
+        # not be left waiting to send its request after we've retried. Responses
+        # served from the cache never reach the provider, so they don't wait.
+        token_messages = None
+        if self.runner.config.get("rate_limits", {}).get("llm_tokens"):
+            with cache as c:
+                is_cached = not bypass_cache and key in c
+            if not is_cached:
+                token_messages = [
+                    {"content": _llm_system_prompt(op_type, output_schema, scratchpad)}
+                ] + messages
+
         max_retries = max_retries_per_timeout
         attempt = 0
         rate_limited_attempt = 0
         while attempt <= max_retries:
+            if token_messages is not None:
+                self._acquire_llm_tokens(token_messages)
             try:
                 return timeout(timeout_seconds)(self._cached_call_llm)(
                     key,
@@ -767,27 +880,7 @@ class APIWrapper(object):
             tools = None
             tool_choice = None
 
-        system_prompt = f"You are a helpful assistant, intelligently processing data. This is a {op_type} operation. You will perform the specified task on the provided data. The result should be a structured output that you will send back to the user."
-        if scratchpad:
-            system_prompt += f"""
-
-You are incrementally processing data across multiple batches. Maintain intermediate state between batches to accomplish this task effectively.
-
-Current scratchpad: {scratchpad}
-
-As you process each batch:
-1. Update the scratchpad with crucial information for subsequent batches.
-2. This may include partial results, counters, or data that doesn't fit into {list(output_schema.keys())}.
-3. Example: For counting elements that appear more than twice, track all occurrences in the scratchpad until an item exceeds the threshold.
-
-Keep the scratchpad concise (~500 chars) and easily parsable. Use clear structures like:
-- Bullet points
-- Key-value pairs
-- JSON-like format
-
-Update the 'updated_scratchpad' field in your output with the new scratchpad content.
-
-Remember: The scratchpad should contain information necessary for processing future batches, not the final result."""
+        system_prompt = _llm_system_prompt(op_type, output_schema, scratchpad)
 
         # Truncate messages if they exceed the model's context length
         messages = truncate_messages(messages, model)
@@ -896,7 +989,7 @@ Remember: The scratchpad should contain information necessary for processing fut
                 for tool in tools:
                     if tool_call.function.name == tool["function"]["name"]:
                         try:
-                            function_args = json.loads(tool_call.function.arguments)
+                            function_args = loads_llm_json(tool_call.function.arguments)
                         except json.JSONDecodeError:
                             return [{}]
                         # Execute the function defined in the tool's code
@@ -917,7 +1010,7 @@ Remember: The scratchpad should contain information necessary for processing fut
             outputs = []
             for tool_call in tool_calls:
                 try:
-                    output_dict = json.loads(tool_call.function.arguments)
+                    output_dict = loads_llm_json(tool_call.function.arguments)
                     if "ollama" in response.model:
                         for key, value in output_dict.items():
                             if not isinstance(value, str):
@@ -995,6 +1088,8 @@ class RichLoopBar:
         desc (Optional[str]): Description to be displayed alongside the progress bar.
         leave (bool): Whether to leave the progress bar on screen after completion.
         console: The Rich console object to use for output.
+        miniters (Optional[int]): Minimum number of iterations between redraws.
+        mininterval (float): Minimum number of seconds between redraws.
     """
 
     def __init__(
@@ -1004,6 +1099,8 @@ class RichLoopBar:
         desc: Optional[str] = None,
         leave: bool = True,
         console=None,
+        miniters: Optional[int] = None,
+        mininterval: float = 0.1,
     ):
         if console is None:
             raise ValueError("Console must be provided")
@@ -1012,6 +1109,8 @@ class RichLoopBar:
         self.total = self._get_total(iterable, total)
         self.description = desc
         self.leave = leave
+        self.miniters = miniters
+        self.mininterval = mininterval
         self.tqdm = None
 
     def _get_total(self, iterable, total):
@@ -1046,6 +1145,8 @@ class RichLoopBar:
             total=self.total,
             desc=self.description,
             file=self.console.file,
+            miniters=self.miniters,
+            mininterval=self.mininterval,
         )
         for item in self.tqdm:
             yield item
@@ -1062,6 +1163,8 @@ class RichLoopBar:
             desc=self.description,
             leave=self.leave,
             file=self.console.file,
+            miniters=self.miniters,
+            mininterval=self.mininterval,
         )
         return self
 
@@ -14,6 +14,7 @@ from tests.conftest import (
     map_sample_data_with_extra_keys as map_sample_data_with_extra_keys,
     map_config_with_drop_keys_no_prompt as map_config_with_drop_keys_no_prompt,
 )
+import uuid
 import pytest
 import docetl
 
@@ -83,6 +84,24 @@ def test_map_operation_with_drop_keys_no_prompt(
     assert cost == 0  # No LLM calls should be made
 
 
+def test_map_operation_with_drop_keys_in_place(
+    map_config_with_drop_keys_no_prompt,
+    default_model,
+    max_threads,
+    map_sample_data_with_extra_keys,
+    api_wrapper,
+):
+    config = {**map_config_with_drop_keys_no_prompt, "in_place": True}
+    operation = MapOperation(api_wrapper, config, default_model, max_threads)
+    results, cost = operation.execute(map_sample_data_with_extra_keys)
+
+    assert cost == 0
+    assert all(
+        result is item for result, item in zip(results, map_sample_data_with_extra_keys)
+    )
+    assert all("to_be_dropped" not in item for item in map_sample_data_with_extra_keys)
+
+
 def test_map_operation_with_batching(
     map_config_with_batching,
     default_model,
@@ -216,3 +235,100 @@ def test_map_operation_with_gleaning(simple_map_config, map_sample_data, api_wra
     assert all(
         any(vs in result["sentiment"] for vs in valid_sentiments) for result in results
     )
+
+
+def test_map_operation_with_row_marshaling(
+    map_config, map_sample_data_large, default_model, max_threads, api_wrapper
+):
+    map_config_with_row_marshaling = {**map_config, "row_marshal_size": 4}
+
+    operation = MapOperation(
+        api_wrapper, map_config_with_row_marshaling, default_model, max_threads
+    )
+    results, cost = operation.execute(map_sample_data_large)
+
+    assert len(results) == len(map_sample_data_large)
+    assert [result["text"] for result in results] == [
+        item["text"] for item in map_sample_data_large
+    ]
+    valid_sentiments = ["positive", "negative", "neutral"]
+    assert all(
+        any(vs in result["sentiment"] for vs in valid_sentiments) for result in results
+    )
+
+
+def test_map_operation_with_invalid_row_marshal_size(
+    map_config, default_model, max_threads, api_wrapper
+):
+    with pytest.raises(ValueError):
+        MapOperation(
+            api_wrapper,
+            {**map_config, "row_marshal_size": 0},
+            default_model,
+            max_threads,
+        )
+
+
+@pytest.fixture
+def llm_call_counter(monkeypatch):
+    # Count the requests actually sent to the LLM, without changing them
+    import docetl.operations.utils as operation_utils
+
+    calls = []
+    real_completion = operation_utils.completion
+
+    def counting_completion(*args, **kwargs):
+        calls.append(kwargs.get("messages"))
+        return real_completion(*args, **kwargs)
+
+    monkeypatch.setattr(operation_utils, "completion", counting_completion)
+    return calls
+
+
+def test_map_operation_shares_calls_for_identical_prompts(
+    map_config, default_model, max_threads, api_wrapper, llm_call_counter
+):
+    # A unique prompt makes sure the shared call isn't answered from the cache
+    config = {**map_config, "prompt": map_config["prompt"] + f" ({uuid.uuid4()})"}
+    input_data = [{"text": "This is a good day."} for _ in range(4)]
+
+    operation = MapOperation(api_wrapper, config, default_model, max_threads)
+    results, cost = operation.execute(input_data)
+
+    assert len(results) == len(input_data)
+    assert all("sentiment" in result for result in results)
+    assert len(llm_call_counter) == 1
+    assert cost > 0
+
+
+def test_map_operation_bypass_cache_does_not_share_calls(
+    map_config, default_model, max_threads, api_wrapper, llm_call_counter
+):
+    config = {**map_config, "bypass_cache": True}
+    input_data = [{"text": "This is a good day."} for _ in range(4)]
+
+    operation = MapOperation(api_wrapper, config, default_model, max_threads)
+    results, cost = operation.execute(input_data)
+
+    assert len(results) == len(input_data)
+    assert all("sentiment" in result for result in results)
+    assert len(llm_call_counter) == len(input_data)
+    assert cost > 0
+
+
+def test_map_operation_config_check_sees_real_values(
+    map_config, default_model, max_threads, api_wrapper
+):
+    # Non-JSON values must be rejected, not stringified before validation
+    with pytest.raises(ValueError):
+        MapOperation(
+            api_wrapper, {**map_config, "model": object()}, default_model, max_threads
+        )
+
+    # Mixed key types can't be sorted for the check's cache key, but are valid
+    MapOperation(
+        api_wrapper,
+        {**map_config, "metadata": {1: "one", "two": 2}},
+        default_model,
+        max_threads,
+    )
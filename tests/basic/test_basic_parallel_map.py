@@ -38,6 +38,31 @@ def test_parallel_map_operation(
     assert cost > 0
 
 
+def test_parallel_map_operation_with_coalesced_prompts(
+    parallel_map_config,
+    default_model,
+    max_threads,
+    parallel_map_sample_data,
+    api_wrapper,
+):
+    parallel_map_config["bypass_cache"] = True
+    parallel_map_config["coalesce_prompts"] = True
+    operation = ParallelMapOperation(
+        api_wrapper, parallel_map_config, default_model, max_threads
+    )
+    results, cost = operation.execute(parallel_map_sample_data)
+
+    assert len(results) == len(parallel_map_sample_data)
+    assert [result["text"] for result in results] == [
+        item["text"] for item in parallel_map_sample_data
+    ]
+    assert all(
+        result["sentiment"] in ["positive", "negative", "neutral"] for result in results
+    )
+    assert all(isinstance(result["word_count"], int) for result in results)
+    assert cost > 0
+
+
 def test_parallel_map_operation_empty_input(
     parallel_map_config, default_model, max_threads, api_wrapper
 ):
@@ -0,0 +1,43 @@
+import math
+
+import pytest
+
+import docetl.operations.utils as operation_utils
+from docetl.operations.utils import loads_llm_json
+
+
+@pytest.fixture(params=["orjson", "json"])
+def json_backend(request, monkeypatch):
+    # Run every test both with orjson (when installed) and with the standard library
+    if request.param == "json":
+        monkeypatch.setattr(operation_utils, "orjson", None)
+    elif operation_utils.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_loads_llm_json(json_backend):
+    payload = '{"sentiment": "positive", "count": 3, "scores": [0.5, 1.0], "ok": true}'
+    assert loads_llm_json(payload) == {
+        "sentiment": "positive",
+        "count": 3,
+        "scores": [0.5, 1.0],
+        "ok": True,
+    }
+    assert loads_llm_json(payload.encode()) == loads_llm_json(payload)
+
+
+def test_loads_llm_json_falls_back_for_nan(json_backend):
+    assert math.isnan(loads_llm_json('{"x": NaN}')["x"])
+
+
+def test_loads_llm_json_falls_back_for_big_ints(json_backend):
+    assert loads_llm_json('{"x": 123456789012345678901234567890}') == {
+        "x": 123456789012345678901234567890
+    }
+    assert loads_llm_json(b'{"x": -9999999999999999999}') == {"x": -9999999999999999999}
+
+
+def test_loads_llm_json_invalid(json_backend):
+    with pytest.raises(ValueError):
+        loads_llm_json('{"x": ')
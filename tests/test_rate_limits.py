@@ -0,0 +1,91 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from docetl.config_wrapper import ConfigWrapper
+
+
+@pytest.fixture
+def token_limited_runner():
+    return ConfigWrapper(
+        {"rate_limits": {"llm_tokens": [{"count": 100, "per": 1, "unit": "second"}]}}
+    )
+
+
+def test_llm_tokens_limit_waits_for_budget(token_limited_runner):
+    # Each message is estimated at 60 tokens, so the second one has to wait
+    messages = [{"role": "user", "content": "x" * 236}]
+
+    start = time.time()
+    token_limited_runner.api._acquire_llm_tokens(messages)
+    assert time.time() - start < 0.5
+
+    token_limited_runner.api._acquire_llm_tokens(messages)
+    assert time.time() - start >= 0.9
+
+
+def test_llm_tokens_limit_with_oversized_prompt(token_limited_runner):
+    # An estimated 500 tokens is more than the window ever holds; this must wait
+    # for a full window rather than raise
+    messages = [{"role": "user", "content": "x" * 2000}]
+
+    start = time.time()
+    token_limited_runner.api._acquire_llm_tokens(messages)
+    token_limited_runner.api._acquire_llm_tokens(messages)
+    assert time.time() - start >= 0.9
+
+
+def test_llm_tokens_limit_not_configured():
+    runner = ConfigWrapper({})
+    messages = [{"role": "user", "content": "x" * 2000}]
+
+    start = time.time()
+    for _ in range(10):
+        runner.api._acquire_llm_tokens(messages)
+    assert time.time() - start < 0.5
+
+
+def test_llm_tokens_wait_does_not_count_against_timeout(
+    token_limited_runner, monkeypatch
+):
+    import docetl.operations.utils as operation_utils
+
+    sent = []
+
+    def fake_completion(model, messages, **kwargs):
+        sent.append(messages)
+        tool_call = SimpleNamespace(
+            function=SimpleNamespace(
+                name="send_output", arguments='{"sentiment": "positive"}'
+            )
+        )
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(tool_calls=[tool_call]))],
+            model=model,
+        )
+
+    monkeypatch.setattr(operation_utils, "completion", fake_completion)
+    monkeypatch.setattr(
+        operation_utils, "truncate_messages", lambda messages, model: messages
+    )
+
+    # Every call needs a full window of tokens, so the third call waits ~2s,
+    # well past its 0.5s timeout
+    def call(i):
+        return token_limited_runner.api.call_llm(
+            "gpt-4o-mini",
+            "map",
+            [{"role": "user", "content": f"{i} " + "x" * 400}],
+            {"sentiment": "string"},
+            timeout_seconds=0.5,
+            max_retries_per_timeout=0,
+            bypass_cache=True,
+        )
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = list(executor.map(call, range(3)))
+
+    assert all(result.response is not None for result in results)
+    assert len(sent) == 3
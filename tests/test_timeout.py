@@ -0,0 +1,49 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import docetl.operations.utils as operation_utils
+from docetl.operations.utils import timeout
+
+
+def test_timeout_returns_result():
+    assert timeout(1)(lambda x: x * 2)(21) == 42
+
+
+def test_timeout_propagates_exceptions():
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        timeout(1)(fail)()
+
+
+def test_timeout_raises_when_call_is_too_slow():
+    start = time.time()
+    with pytest.raises(TimeoutError):
+        timeout(0.2)(time.sleep)(1)
+    assert time.time() - start < 0.9
+
+
+def test_timeout_raises_when_no_worker_frees_up(monkeypatch):
+    monkeypatch.setattr(
+        operation_utils, "_timeout_executor", ThreadPoolExecutor(max_workers=1)
+    )
+    release = threading.Event()
+    calls = []
+
+    # Occupy the only worker with a call that times out but never returns
+    with pytest.raises(TimeoutError):
+        timeout(0.1)(release.wait)()
+
+    start = time.time()
+    with pytest.raises(TimeoutError):
+        timeout(0.2)(calls.append)(1)
+    assert time.time() - start < 0.9
+
+    # The queued call was cancelled, so it doesn't run once the worker frees up
+    release.set()
+    time.sleep(0.1)
+    assert calls == []